@@ -0,0 +1,71 @@
+"""
+Shared HTTP client for outbound Sokosumi calls.
+
+A single httpx.AsyncClient keeps TCP + TLS connections to the Sokosumi API
+pooled and reused across requests instead of paying a fresh handshake on
+every call. In HTTP mode the client is opened and closed by the Starlette
+lifespan; in stdio mode it is created lazily on first use.
+"""
+
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    """
+    Create the pooled client used for all Sokosumi requests.
+
+    HTTP/2 multiplexes concurrent requests to the same host over one TLS
+    connection, at the cost of a little per-connection HPACK state. httpx
+    falls back to HTTP/1.1 when the server does not negotiate h2 via ALPN.
+    """
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=10.0,
+        limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=30),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client, creating it if needed."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client and release its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def with_http_client(lifespan: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """
+    Wrap a Starlette lifespan so the shared client lives as long as the app.
+
+    The client is created inside the lifespan so it binds to the running
+    event loop, and closed on shutdown.
+    """
+
+    @asynccontextmanager
+    async def wrapped(app: Any) -> AsyncIterator[Any]:
+        get_http_client()
+        logger.info("Opened shared Sokosumi HTTP client")
+        try:
+            async with lifespan(app) as state:
+                yield state
+        finally:
+            await close_http_client()
+            logger.info("Closed shared Sokosumi HTTP client")
+
+    return wrapped
@@ -15,21 +15,24 @@ Flow:
 """
 
 import os
+import asyncio
 import time
 import secrets
 import hashlib
 import base64
 import logging
-import httpx
 from typing import Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta, timezone
-from urllib.parse import urlencode
+from urllib.parse import quote_plus, urlencode, urlsplit
 
 import jwt
+import orjson
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.backends import default_backend
 
+from http_client import get_http_client
+
 logger = logging.getLogger(__name__)
 
 # Server URLs
@@ -74,6 +77,8 @@ SOKOSUMI_OAUTH_BASE_URL = _normalize_sokosumi_oauth_base_url(
 SOKOSUMI_AUTH_ENDPOINT = f"{SOKOSUMI_OAUTH_BASE_URL}/oauth2/authorize"
 SOKOSUMI_TOKEN_ENDPOINT = f"{SOKOSUMI_OAUTH_BASE_URL}/oauth2/token"
 SOKOSUMI_USERINFO_ENDPOINT = f"{SOKOSUMI_OAUTH_BASE_URL}/oauth2/userinfo"
+# Expected iss claim of Sokosumi id_tokens
+SOKOSUMI_OAUTH_ISSUER = os.environ.get("SOKOSUMI_OAUTH_ISSUER", SOKOSUMI_OAUTH_BASE_URL)
 SOKOSUMI_OAUTH_SCOPE = os.environ.get("SOKOSUMI_OAUTH_SCOPE", "openid offline_access")
 
 # OAuth client credentials (set via environment)
@@ -81,16 +86,56 @@ OAUTH_CLIENT_ID = os.environ.get("OAUTH_CLIENT_ID", "")
 OAUTH_CLIENT_SECRET = os.environ.get("OAUTH_CLIENT_SECRET", "")
 OAUTH_REDIRECT_URI = f"{MCP_SERVER_URL}/oauth/callback"
 
+# Optional allow-list of MCP client redirect URIs (comma-separated). Entries
+# ending in ":*" accept any port on that scheme and host, e.g.
+# "http://localhost:*"; other entries ending in "*" match by path prefix on an
+# exact scheme, host and port. When unset, any redirect URI is accepted.
+_allowed_redirect_entries = [
+    entry.strip()
+    for entry in os.environ.get("OAUTH_ALLOWED_REDIRECT_URIS", "").split(",")
+    if entry.strip()
+]
+_ALLOWED_REDIRECT_URIS = frozenset(
+    entry for entry in _allowed_redirect_entries if not entry.endswith("*")
+)
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _effective_port(scheme: str, port: Optional[int]) -> Optional[int]:
+    """Return the explicit port, or the scheme's default when none is given."""
+    return port if port is not None else _DEFAULT_PORTS.get(scheme)
+
+
+def _parse_redirect_pattern(entry: str) -> Tuple[str, str, Optional[int], str]:
+    """Split a wildcard allow-list entry into (scheme, host, port, path prefix); port None is any."""
+    if entry.endswith(":*"):
+        parts = urlsplit(entry[:-2])
+        return parts.scheme, parts.hostname or "", None, ""
+    parts = urlsplit(entry[:-1])
+    return parts.scheme, parts.hostname or "", _effective_port(parts.scheme, parts.port), parts.path
+
+
+_ALLOWED_REDIRECT_PATTERNS = [
+    _parse_redirect_pattern(entry)
+    for entry in _allowed_redirect_entries
+    if entry.endswith("*")
+]
+
 # RSA Key Management for JWT signing
 _private_key = None
 _public_key = None
 _key_id = None
+_jwks: Optional[Dict[str, Any]] = None
 
-# Session storage
+# Session storage. These are plain in-process dicts, so every session, code and
+# token lookup is non-blocking and safe to call directly from the event loop.
+# A networked store (e.g. Redis) should use its async client rather than
+# blocking calls from the handlers.
 _mcp_sessions: Dict[str, Dict[str, Any]] = {}  # MCP client sessions (from mcp-remote)
 _sokosumi_sessions: Dict[str, Dict[str, Any]] = {}  # Sokosumi OAuth state tracking
 _auth_codes: Dict[str, Dict[str, Any]] = {}  # MCP auth codes (issued to mcp-remote)
 _refresh_tokens: Dict[str, Dict[str, Any]] = {}
+_inflight_refreshes: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}  # Coalesced refreshes
 
 # Token settings
 ACCESS_TOKEN_EXPIRY = 3600  # 1 hour
@@ -108,7 +153,7 @@ def _generate_rsa_keys() -> Tuple[Any, Any, str]:
     )
     public_key = private_key.public_key()
     key_id = secrets.token_urlsafe(16)
-    logger.info(f"Generated new RSA key pair with kid: {key_id}")
+    logger.info("Generated new RSA key pair with kid: %s", key_id)
     return private_key, public_key, key_id
 
 
@@ -126,10 +171,10 @@ def _load_or_generate_keys():
             )
             _public_key = _private_key.public_key()
             _key_id = os.environ.get("OAUTH_KEY_ID", secrets.token_urlsafe(16))
-            logger.info(f"Loaded RSA keys from environment with kid: {_key_id}")
+            logger.info("Loaded RSA keys from environment with kid: %s", _key_id)
             return
         except Exception as e:
-            logger.warning(f"Failed to load keys from environment: {e}, generating new keys")
+            logger.warning("Failed to load keys from environment: %s, generating new keys", e)
 
     _private_key, _public_key, _key_id = _generate_rsa_keys()
 
@@ -143,8 +188,21 @@ def get_keys():
 
 
 def get_jwks() -> Dict[str, Any]:
-    """Get the JWKS containing our public key for JWT verification."""
+    """
+    Get the JWKS containing our public key for JWT verification.
+
+    The key set is built once per signing key and reused; validation itself is
+    offline and never fetches a JWKS.
+    """
+    global _jwks
     _, public_key, key_id = get_keys()
+    if _jwks is None or _jwks["keys"][0]["kid"] != key_id:
+        _jwks = _build_jwks(public_key, key_id)
+    return _jwks
+
+
+def _build_jwks(public_key: Any, key_id: str) -> Dict[str, Any]:
+    """Encode an RSA public key as a single-key JWKS."""
     public_numbers = public_key.public_numbers()
 
     def int_to_base64url(n: int, length: int) -> str:
@@ -202,6 +260,37 @@ def get_www_authenticate_header(scope: Optional[str] = None) -> str:
     return header
 
 
+def is_allowed_redirect_uri(redirect_uri: str) -> bool:
+    """Check a client redirect URI against OAUTH_ALLOWED_REDIRECT_URIS."""
+    if not _allowed_redirect_entries:
+        return True
+    if redirect_uri in _ALLOWED_REDIRECT_URIS:
+        return True
+    if not _ALLOWED_REDIRECT_PATTERNS:
+        return False
+
+    # Wildcard entries are compared component-wise on the parsed URI, never
+    # as raw string prefixes, so "http://localhost:80@evil.com/" cannot pass
+    # for localhost. Userinfo is never legitimate in a redirect URI.
+    try:
+        parts = urlsplit(redirect_uri)
+        port = _effective_port(parts.scheme, parts.port)
+    except ValueError:
+        return False
+    if "@" in parts.netloc or not parts.hostname:
+        return False
+
+    for scheme, host, allowed_port, path_prefix in _ALLOWED_REDIRECT_PATTERNS:
+        if (
+            parts.scheme == scheme
+            and parts.hostname == host
+            and (allowed_port is None or port == allowed_port)
+            and parts.path.startswith(path_prefix)
+        ):
+            return True
+    return False
+
+
 def _sokosumi_token_request_payload(grant_type: str, **values: Any) -> Dict[str, Any]:
     """Build a Better Auth OAuth token request without empty optional fields."""
     payload = {
@@ -257,12 +346,16 @@ def create_mcp_session(
         "code_challenge_method": code_challenge_method,
         "scope": scope,
         "state": state,
+        # Pre-encoded pieces of the final client redirect, so the callback
+        # only has to splice in the auth code
+        "redirect_separator": "&" if "?" in redirect_uri else "?",
+        "state_encoded": quote_plus(state),
         "resource": resource,
         "created_at": time.time(),
     }
 
     _cleanup_expired_sessions()
-    logger.info(f"Created MCP session: {session_id[:8]}...")
+    logger.info("Created MCP session: %.8s...", session_id)
     return session_id
 
 
@@ -313,7 +406,7 @@ def build_sokosumi_auth_url(mcp_session_id: str) -> str:
     }
 
     url = f"{SOKOSUMI_AUTH_ENDPOINT}?{urlencode(params)}"
-    logger.info(f"Built Sokosumi auth URL for MCP session {mcp_session_id[:8]}...")
+    logger.info("Built Sokosumi auth URL for MCP session %.8s...", mcp_session_id)
     return url
 
 
@@ -332,66 +425,66 @@ async def exchange_sokosumi_code(code: str, state: str) -> Dict[str, Any]:
         raise ValueError("Session expired")
 
     # Exchange code for tokens with Sokosumi
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            SOKOSUMI_TOKEN_ENDPOINT,
-            json=_sokosumi_token_request_payload(
-                "authorization_code",
-                code=code,
-                redirect_uri=OAUTH_REDIRECT_URI,
-                code_verifier=sokosumi_session["code_verifier"],
-            ),
-            headers={"Content-Type": "application/json"},
-            timeout=30.0,
-        )
+    client = get_http_client()
+    response = await client.post(
+        SOKOSUMI_TOKEN_ENDPOINT,
+        json=_sokosumi_token_request_payload(
+            "authorization_code",
+            code=code,
+            redirect_uri=OAUTH_REDIRECT_URI,
+            code_verifier=sokosumi_session["code_verifier"],
+        ),
+        headers={"Content-Type": "application/json"},
+        timeout=30.0,
+    )
 
-        if response.status_code != 200:
-            logger.error(f"Sokosumi token exchange failed: {response.status_code} - {response.text}")
-            raise ValueError(f"Token exchange failed: {response.text}")
+    if response.status_code != 200:
+        logger.error("Sokosumi token exchange failed: %s - %s", response.status_code, response.text)
+        raise ValueError(f"Token exchange failed: {response.text}")
 
-        token_data = response.json()
-        if not token_data.get("access_token"):
-            logger.error(f"Sokosumi token exchange response missing access_token: {token_data}")
-            raise ValueError("Token exchange failed: missing access_token")
-        logger.info("Successfully exchanged Sokosumi auth code for tokens")
+    token_data = orjson.loads(response.content)
+    if not token_data.get("access_token"):
+        logger.error("Sokosumi token exchange response missing access_token: %s", token_data)
+        raise ValueError("Token exchange failed: missing access_token")
+    logger.info("Successfully exchanged Sokosumi auth code for tokens")
 
-        return {
-            "access_token": token_data.get("access_token"),
-            "refresh_token": token_data.get("refresh_token"),
-            "expires_in": token_data.get("expires_in"),
-            "id_token": token_data.get("id_token"),
-            "mcp_session_id": sokosumi_session["mcp_session_id"],
-        }
+    return {
+        "access_token": token_data.get("access_token"),
+        "refresh_token": token_data.get("refresh_token"),
+        "expires_in": token_data.get("expires_in"),
+        "id_token": token_data.get("id_token"),
+        "mcp_session_id": sokosumi_session["mcp_session_id"],
+    }
 
 
 async def refresh_sokosumi_access_token(refresh_token: str) -> Dict[str, Any]:
     """Refresh the upstream Sokosumi OAuth access token."""
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            SOKOSUMI_TOKEN_ENDPOINT,
-            json=_sokosumi_token_request_payload(
-                "refresh_token",
-                refresh_token=refresh_token,
-            ),
-            headers={"Content-Type": "application/json"},
-            timeout=30.0,
-        )
+    client = get_http_client()
+    response = await client.post(
+        SOKOSUMI_TOKEN_ENDPOINT,
+        json=_sokosumi_token_request_payload(
+            "refresh_token",
+            refresh_token=refresh_token,
+        ),
+        headers={"Content-Type": "application/json"},
+        timeout=30.0,
+    )
 
-        if response.status_code != 200:
-            logger.error(f"Sokosumi refresh failed: {response.status_code} - {response.text}")
-            raise ValueError(f"Sokosumi token refresh failed: {response.text}")
+    if response.status_code != 200:
+        logger.error("Sokosumi refresh failed: %s - %s", response.status_code, response.text)
+        raise ValueError(f"Sokosumi token refresh failed: {response.text}")
 
-        token_data = response.json()
-        if not token_data.get("access_token"):
-            logger.error(f"Sokosumi refresh response missing access_token: {token_data}")
-            raise ValueError("Sokosumi token refresh failed: missing access_token")
-        logger.info("Successfully refreshed Sokosumi access token")
-        return {
-            "access_token": token_data.get("access_token"),
-            "refresh_token": token_data.get("refresh_token") or refresh_token,
-            "expires_in": token_data.get("expires_in"),
-            "id_token": token_data.get("id_token"),
-        }
+    token_data = orjson.loads(response.content)
+    if not token_data.get("access_token"):
+        logger.error("Sokosumi refresh response missing access_token: %s", token_data)
+        raise ValueError("Sokosumi token refresh failed: missing access_token")
+    logger.info("Successfully refreshed Sokosumi access token")
+    return {
+        "access_token": token_data.get("access_token"),
+        "refresh_token": token_data.get("refresh_token") or refresh_token,
+        "expires_in": token_data.get("expires_in"),
+        "id_token": token_data.get("id_token"),
+    }
 
 
 # ============================================================================
@@ -423,11 +516,11 @@ def create_mcp_auth_code(
         "code_created_at": time.time(),
     }
 
-    logger.info(f"Created MCP auth code for user: {user_id}")
+    logger.info("Created MCP auth code for user: %s", user_id)
     return code
 
 
-def exchange_code_for_tokens(
+async def exchange_code_for_tokens(
     code: str,
     code_verifier: str,
     client_id: str,
@@ -458,7 +551,7 @@ def exchange_code_for_tokens(
         raise ValueError("Invalid code verifier")
 
     # Generate MCP tokens
-    access_token = _create_access_token(
+    access_token = await _create_access_token(
         user_id=auth_data["user_id"],
         sokosumi_token=auth_data["sokosumi_access_token"],
         scope=auth_data["scope"],
@@ -473,19 +566,30 @@ def exchange_code_for_tokens(
         client_id=client_id,
     )
 
-    logger.info(f"Exchanged MCP code for tokens for user: {auth_data['user_id']}")
+    logger.info("Exchanged MCP code for tokens for user: %s", auth_data["user_id"])
 
-    return {
-        "access_token": access_token,
-        "token_type": "Bearer",
-        "expires_in": ACCESS_TOKEN_EXPIRY,
-        "refresh_token": refresh_token,
-        "scope": auth_data["scope"],
-    }
+    return _token_response(access_token, refresh_token, auth_data["scope"])
 
 
 async def refresh_access_token(refresh_token: str) -> Dict[str, Any]:
-    """Refresh an MCP access token."""
+    """
+    Refresh an MCP access token.
+
+    Concurrent refreshes of the same refresh token share one rotation, so a
+    client that retries in parallel gets the same new tokens instead of racing
+    the rotation and the upstream Sokosumi refresh.
+    """
+    refresh = _inflight_refreshes.get(refresh_token)
+    if refresh is None:
+        refresh = asyncio.ensure_future(_rotate_refresh_token(refresh_token))
+        _inflight_refreshes[refresh_token] = refresh
+        refresh.add_done_callback(lambda _: _inflight_refreshes.pop(refresh_token, None))
+    # Shield so one cancelled caller does not cancel the shared rotation
+    return await asyncio.shield(refresh)
+
+
+async def _rotate_refresh_token(refresh_token: str) -> Dict[str, Any]:
+    """Validate a refresh token, refresh upstream, and issue rotated tokens."""
     token_data = _refresh_tokens.get(refresh_token)
     if not token_data:
         raise ValueError("Invalid refresh token")
@@ -501,7 +605,7 @@ async def refresh_access_token(refresh_token: str) -> Dict[str, Any]:
         sokosumi_token = upstream_tokens["access_token"]
         sokosumi_refresh_token = upstream_tokens.get("refresh_token") or sokosumi_refresh_token
 
-    access_token = _create_access_token(
+    access_token = await _create_access_token(
         user_id=token_data["user_id"],
         sokosumi_token=sokosumi_token,
         scope=token_data["scope"],
@@ -518,24 +622,34 @@ async def refresh_access_token(refresh_token: str) -> Dict[str, Any]:
         client_id=token_data["client_id"],
     )
 
-    logger.info(f"Refreshed tokens for user: {token_data['user_id']}")
+    logger.info("Refreshed tokens for user: %s", token_data["user_id"])
 
+    return _token_response(access_token, new_refresh_token, token_data["scope"])
+
+
+def _token_response(access_token: str, refresh_token: str, scope: str) -> Dict[str, Any]:
+    """Build the OAuth token endpoint response body."""
     return {
         "access_token": access_token,
         "token_type": "Bearer",
         "expires_in": ACCESS_TOKEN_EXPIRY,
-        "refresh_token": new_refresh_token,
-        "scope": token_data["scope"],
+        "refresh_token": refresh_token,
+        "scope": scope,
     }
 
 
-def _create_access_token(
+async def _create_access_token(
     user_id: str,
     sokosumi_token: str,
     scope: str,
     client_id: str,
 ) -> str:
-    """Create a signed JWT access token for MCP clients."""
+    """
+    Create a signed JWT access token for MCP clients.
+
+    Like verification, the RS256 signature is CPU work and runs in a worker
+    thread.
+    """
     private_key, _, key_id = get_keys()
     now = datetime.now(timezone.utc)
 
@@ -552,7 +666,8 @@ def _create_access_token(
         "sokosumi_token": sokosumi_token,  # Include for downstream API calls
     }
 
-    return jwt.encode(
+    return await asyncio.to_thread(
+        jwt.encode,
         payload,
         private_key,
         algorithm="RS256",
@@ -583,9 +698,18 @@ def _create_refresh_token(
 
 
 async def validate_access_token(token: str) -> Dict[str, Any]:
-    """Validate an MCP access token and return the payload."""
-    _, public_key, key_id = get_keys()
+    """
+    Validate an MCP access token and return the payload.
+
+    The RS256 signature check is CPU work, so it runs in a worker thread to
+    keep the event loop free for concurrent requests.
+    """
+    _, public_key, _ = get_keys()
+    return await asyncio.to_thread(_decode_access_token, token, public_key)
+
 
+def _decode_access_token(token: str, public_key: Any) -> Dict[str, Any]:
+    """Verify an MCP access token's signature and claims."""
     try:
         payload = jwt.decode(
             token,
@@ -604,14 +728,14 @@ async def validate_access_token(token: str) -> Dict[str, Any]:
             },
         )
 
-        logger.info(f"Validated access token for user: {payload.get('sub', 'unknown')}")
+        logger.info("Validated access token for user: %s", payload.get("sub", "unknown"))
         return payload
 
     except jwt.ExpiredSignatureError:
         logger.warning("Access token expired")
         raise
     except jwt.InvalidTokenError as e:
-        logger.warning(f"Invalid access token: {e}")
+        logger.warning("Invalid access token: %s", e)
         raise
 
 
@@ -640,4 +764,4 @@ def _cleanup_expired_sessions():
         del _refresh_tokens[token]
 
     if expired:
-        logger.info(f"Cleaned up expired sessions/tokens")
+        logger.info("Cleaned up expired sessions/tokens")
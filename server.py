@@ -6,28 +6,44 @@ OAuth 2.1 authentication delegates to Sokosumi's OAuth provider.
 """
 
 import os
+import asyncio
+import atexit
+import gzip
+import hashlib
+import html
 import logging
+import logging.handlers
+import queue
 import sys
-from typing import Optional, Dict, Any
-from urllib.parse import urlencode, parse_qs
+import time
+from collections import OrderedDict
+from functools import wraps
+from itertools import islice
+from typing import Optional, Dict, Any, Tuple, Callable
+from urllib.parse import parse_qsl
 import httpx
 import jwt
+import orjson
 from mcp.server.fastmcp import FastMCP
 from mcp.server.transport_security import TransportSecuritySettings
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import JSONResponse, Response, RedirectResponse, HTMLResponse
-from starlette.routing import Route
+from starlette.routing import Mount, Route
+from starlette.types import ASGIApp, Receive, Scope, Send
 from contextvars import ContextVar
 
+from http_client import get_http_client, with_http_client
 from oauth import (
     MCP_SERVER_URL,
+    OAUTH_CLIENT_ID,
+    SOKOSUMI_OAUTH_ISSUER,
     SOKOSUMI_USERINFO_ENDPOINT,
     validate_access_token,
     get_protected_resource_metadata,
     get_authorization_server_metadata,
     get_www_authenticate_header,
     get_jwks,
+    is_allowed_redirect_uri,
     create_mcp_session,
     get_mcp_session,
     build_sokosumi_auth_url,
@@ -37,13 +53,43 @@ from oauth import (
     refresh_access_token,
 )
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    stream=sys.stderr
+# Set up logging. LOG_LEVEL (e.g. WARNING) quiets the per-request info logs
+# of the middleware and tools in busy deployments. The accepted names are
+# uvicorn's, since the same value is passed to uvicorn.run; TRACE is uvicorn's
+# level below DEBUG.
+_LOG_LEVELS = {
+    "critical": logging.CRITICAL,
+    "error": logging.ERROR,
+    "warning": logging.WARNING,
+    "info": logging.INFO,
+    "debug": logging.DEBUG,
+    "trace": 5,
+}
+_requested_log_level = (os.environ.get("LOG_LEVEL") or "info").strip().lower()
+LOG_LEVEL = _requested_log_level if _requested_log_level in _LOG_LEVELS else "info"
+
+# The blocking write to stderr happens on a background listener thread. On the
+# request path QueueHandler.prepare() still interpolates the message (and any
+# traceback) before enqueueing; the listener applies the line format.
+_log_handler = logging.StreamHandler(sys.stderr)
+_log_handler.setFormatter(
+    logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 )
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(
+    _log_queue, _log_handler, respect_handler_level=True
+)
+logging.root.setLevel(_LOG_LEVELS[LOG_LEVEL])
+logging.root.addHandler(logging.handlers.QueueHandler(_log_queue))
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
+if LOG_LEVEL != _requested_log_level:
+    logger.warning(
+        "Unknown LOG_LEVEL %r (expected one of %s), using info",
+        _requested_log_level,
+        ", ".join(_LOG_LEVELS),
+    )
 
 # Create the FastMCP server instance with transport security configured for Railway
 # This allows the custom domain mcp.sokosumi.com to be used
@@ -56,17 +102,134 @@ mcp = FastMCP(
     )
 )
 
-# Simple in-memory storage for demonstration
-api_keys = {}
-networks = {}
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson instead of the stdlib encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+def _json_text(obj: Any, option: Optional[int] = None) -> str:
+    """Serialize obj to a JSON string for MCP text content."""
+    return orjson.dumps(obj, option=option).decode()
+
+
+def _text_content(obj: Any) -> Dict[str, Any]:
+    """Wrap obj, serialized once, in an MCP text content array."""
+    return {"content": [{"type": "text", "text": _json_text(obj)}]}
+
 
 # Context variables to store request-specific data
 current_api_key: ContextVar[Optional[str]] = ContextVar('current_api_key', default=None)
 current_network: ContextVar[Optional[str]] = ContextVar('current_network', default=None)
 current_user: ContextVar[Optional[Dict[str, Any]]] = ContextVar('current_user', default=None)
 
+# Bound once: every Sokosumi call reads the request's API key
+_get_context_api_key = current_api_key.get
+
+# Fallback credential for stdio/local use, read once at import
+_ENV_API_KEY = (
+    os.environ.get("SOKOSUMI_API_KEY")
+    or os.environ.get("SOKOSUMI_AUTH_TOKEN")
+    or os.environ.get("API_KEY")
+)
+
+
+class TTLCache:
+    """Small in-process LRU cache whose entries expire after a TTL."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, Tuple[Any, float]]" = OrderedDict()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Any, value: Any, ttl: Optional[float] = None) -> None:
+        """Store value under key, evicting the least recently used entries."""
+        self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+# Per-process key for hashing secrets into cache keys
+_CACHE_KEY_SECRET = os.urandom(32)
+
+
+def _cache_key(secret: str) -> bytes:
+    """Derive a keyed 128-bit BLAKE2b cache key so raw secrets are never keys."""
+    return hashlib.blake2b(secret.encode(), key=_CACHE_KEY_SECRET, digest_size=16).digest()
+
+
+# Positive direct-Bearer validations, keyed by (API base URL, token hash) so the
+# raw secret is never used as a key. Failures are never cached.
+BEARER_VALIDATION_TTL = 60.0
+_bearer_validation_cache = TTLCache(maxsize=10_000, ttl=BEARER_VALIDATION_TTL)
+# In-flight validations, keyed like the cache, shared by concurrent requests
+_inflight_bearer_validations: Dict[Tuple[str, bytes], "asyncio.Future[bool]"] = {}
+
+# Verified MCP access-token payloads, keyed by token hash. An entry never
+# outlives the token's own exp claim. Failures are never cached.
+JWT_CACHE_TTL = 30.0
+_jwt_payload_cache = TTLCache(maxsize=10_000, ttl=JWT_CACHE_TTL)
+
+# Paths served without authentication (OAuth discovery and flow endpoints)
+PUBLIC_PATH_PREFIXES = ("/.well-known/", "/oauth/")
+
+# Raw substrings that must appear in a query string carrying an API key
+# (api_key, apiKey, token, access_token)
+_API_KEY_QUERY_MARKERS = (b"api_key=", b"apiKey=", b"token=")
+
+
+def _network_from_query(query_string: bytes) -> str:
+    """
+    Return the network selected by ?network= in a raw query string.
+
+    Only "preprod" selects preprod; anything else, or no parameter at all,
+    means mainnet. As with query_params, the last occurrence wins.
+    """
+    network = "mainnet"
+    if b"network=" not in query_string:
+        return network
+    for pair in query_string.split(b"&"):
+        if pair.startswith(b"network="):
+            network = "preprod" if pair == b"network=preprod" else "mainnet"
+    return network
+
+
+def _api_key_from_query(query_string: bytes) -> Optional[str]:
+    """
+    Return the API key carried in a raw query string, if any.
+
+    `api_key` is the documented legacy remote URL form; the aliases accept
+    older/generated variants safely. The query string is only parsed when one
+    of the names can be present.
+    """
+    if not any(marker in query_string for marker in _API_KEY_QUERY_MARKERS):
+        return None
+    query = dict(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True))
+    return (
+        query.get('api_key')
+        or query.get('apiKey')
+        or query.get('token')
+        or query.get('access_token')
+        or None
+    )
+
+
 # Middleware for authentication (API key, direct Bearer token, or OAuth Bearer JWT)
-class AuthenticationMiddleware(BaseHTTPMiddleware):
+class AuthenticationMiddleware:
     """
     Authentication middleware supporting dual auth:
     1. API key (query param ?api_key= or header x-api-key/token)
@@ -75,117 +238,158 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
 
     Priority: explicit API key takes precedence over Bearer token.
     If neither is provided/valid, returns 401 with WWW-Authenticate header.
+
+    Implemented as plain ASGI rather than BaseHTTPMiddleware so the wrapped
+    app runs in the same task (no extra task group or memory streams) and
+    /mcp streaming responses pass straight through.
     """
 
-    async def dispatch(self, request: Request, call_next):
-        api_token = None
-        network_token = None
-        user_token = None
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
 
-        try:
-            # Handle well-known and OAuth endpoints without authentication
-            if request.url.path.startswith("/.well-known/") or request.url.path.startswith("/oauth/"):
-                return await call_next(request)
-
-            # Extract network from query parameters (preprod or mainnet)
-            network = request.query_params.get('network', 'mainnet')
-            if network not in ['preprod', 'mainnet']:
-                network = 'mainnet'
-            network_token = current_network.set(network)
-            networks["current"] = network
-            logger.info(f"Using network: {network}")
-
-            # Try API key authentication first
-            api_key = self._extract_api_key(request)
-            if api_key:
-                api_token = current_api_key.set(api_key)
-                api_keys["current"] = api_key
-                logger.info(f"Authenticated via API key: {api_key[:8]}..." if len(api_key) > 8 else "API key auth")
-                response = await call_next(request)
-                return self._cleanup_and_return(response, api_token, network_token, user_token)
-
-            # Try Bearer token authentication. MCP OAuth tokens are JWTs issued
-            # by this server. Other bearer values, including Sokosumi tokens that
-            # happen to use JWT format, are passed through as direct Sokosumi
-            # API/OAuth tokens for clients that only expose a Bearer token field.
-            bearer_token = self._extract_bearer_token(request)
-            if bearer_token:
-                if not self._is_mcp_access_token(bearer_token):
-                    if not await self._validate_sokosumi_bearer_token(bearer_token, network):
-                        logger.warning("Invalid direct Bearer token")
-                        return self._unauthorized_response("Invalid bearer token")
-
-                    api_token = current_api_key.set(bearer_token)
-                    api_keys["current"] = bearer_token
-                    logger.info(
-                        "Authenticated via direct Bearer token: %s...",
-                        bearer_token[:8],
-                    )
-                    response = await call_next(request)
-                    return self._cleanup_and_return(response, api_token, network_token, user_token)
-
-                try:
-                    user_payload = await validate_access_token(bearer_token)
-                    user_token = current_user.set(user_payload)
-
-                    # Extract Sokosumi token from JWT payload for downstream API calls
-                    # This is the Sokosumi OAuth access token obtained during authentication
-                    sokosumi_token = user_payload.get('sokosumi_token')
-                    if sokosumi_token:
-                        # Store the Sokosumi token as the "API key" for downstream calls
-                        # The Sokosumi API accepts Bearer tokens as well
-                        api_token = current_api_key.set(sokosumi_token)
-                        api_keys["current"] = sokosumi_token
-
-                    logger.info(f"Authenticated via JWT for user: {user_payload.get('sub', 'unknown')}")
-                    response = await call_next(request)
-                    return self._cleanup_and_return(response, api_token, network_token, user_token)
-                except jwt.InvalidTokenError as e:
-                    logger.warning(f"Invalid JWT token: {e}")
-                    return self._unauthorized_response("Invalid or expired token")
-                except Exception as e:
-                    logger.error(f"JWT validation error: {e}")
-                    return self._unauthorized_response("Token validation failed")
-
-            # No valid authentication - return 401
-            # Only require auth for /mcp endpoint, allow other endpoints through
-            if request.url.path.startswith("/mcp"):
-                return self._unauthorized_response("Authentication required")
-
-            # Allow non-MCP endpoints through (health checks, etc.)
-            response = await call_next(request)
-            return self._cleanup_and_return(response, api_token, network_token, user_token)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Handle lifespan, well-known and OAuth endpoints without authentication
+        if scope["type"] != "http" or scope["path"].startswith(PUBLIC_PATH_PREFIXES):
+            await self.app(scope, receive, send)
+            return
 
+        path = scope["path"]
+
+        # Extract network from query parameters (preprod or mainnet)
+        network = _network_from_query(scope["query_string"])
+        logger.info("Using network: %s", network)
+
+        try:
+            sokosumi_token, user_payload, error = await self._authenticate(scope, network)
         except Exception as e:
-            logger.error(f"Middleware error: {e}")
-            return await call_next(request)
-
-    def _extract_api_key(self, request: Request) -> Optional[str]:
-        """Extract API key from query param or header."""
-        # Check query parameter first. `api_key` is the documented legacy
-        # remote URL form; the aliases accept older/generated variants safely.
-        api_key = (
-            request.query_params.get('api_key')
-            or request.query_params.get('apiKey')
-            or request.query_params.get('token')
-            or request.query_params.get('access_token')
-        )
+            logger.error("Middleware error: %s", e)
+            sokosumi_token, user_payload, error = None, None, None
+
+        # No valid authentication - return 401
+        # Only require auth for /mcp endpoint, allow other endpoints through
+        # (health checks, etc.)
+        is_mcp_path = path == "/mcp" or path.startswith("/mcp/")
+        if error is None and sokosumi_token is None and user_payload is None:
+            if is_mcp_path:
+                error = "Authentication required"
+
+        if error is not None:
+            await self._unauthorized_response(error)(scope, receive, send)
+            return
+
+        network_token = current_network.set(network)
+        user_token = current_user.set(user_payload) if user_payload is not None else None
+        api_token = current_api_key.set(sokosumi_token) if sokosumi_token else None
+        # Warm the search index once per MCP session: only the initialize
+        # request arrives without an mcp-session-id header.
+        if sokosumi_token and is_mcp_path and not any(
+            name == b"mcp-session-id" for name, _ in scope["headers"]
+        ):
+            prefetch_agent_index(sokosumi_token, get_base_url(network))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # Reset in reverse order of setting so nothing leaks into the
+            # next request handled by this task.
+            if api_token is not None:
+                current_api_key.reset(api_token)
+            if user_token is not None:
+                current_user.reset(user_token)
+            current_network.reset(network_token)
+
+    async def _authenticate(
+        self, scope: Scope, network: str
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Resolve the credentials presented with a request.
+
+        Returns:
+            A (sokosumi_token, user_payload, error) tuple. sokosumi_token is the
+            credential to use for downstream Sokosumi calls, user_payload the
+            verified MCP JWT claims, and error a 401 detail message when the
+            presented credential was rejected. All three are None when no
+            credential was presented.
+        """
+        # Try API key authentication first
+        api_key, bearer_token = self._extract_credentials(scope)
         if api_key:
-            return api_key
+            if len(api_key) > 8:
+                logger.info("Authenticated via API key: %.8s...", api_key)
+            else:
+                logger.info("API key auth")
+            return api_key, None, None
 
-        # Check API key headers
-        api_key = request.headers.get('x-api-key') or request.headers.get('token')
+        if not bearer_token:
+            return None, None, None
+
+        # Try Bearer token authentication. MCP OAuth tokens are JWTs issued
+        # by this server. Other bearer values, including Sokosumi tokens that
+        # happen to use JWT format, are passed through as direct Sokosumi
+        # API/OAuth tokens for clients that only expose a Bearer token field.
+        if not self._is_mcp_access_token(bearer_token):
+            if not await self._validate_sokosumi_bearer_token(bearer_token, network):
+                logger.warning("Invalid direct Bearer token")
+                return None, None, "Invalid bearer token"
+
+            logger.info("Authenticated via direct Bearer token: %.8s...", bearer_token)
+            return bearer_token, None, None
+
+        try:
+            user_payload = await self._validate_mcp_access_token(bearer_token)
+        except jwt.InvalidTokenError as e:
+            logger.warning("Invalid JWT token: %s", e)
+            return None, None, "Invalid or expired token"
+        except Exception as e:
+            logger.error("JWT validation error: %s", e)
+            return None, None, "Token validation failed"
+
+        # Extract Sokosumi token from JWT payload for downstream API calls
+        # This is the Sokosumi OAuth access token obtained during authentication.
+        # The Sokosumi API accepts Bearer tokens as well, so it becomes the
+        # "API key" for downstream calls.
+        sokosumi_token = user_payload.get('sokosumi_token') or None
+
+        logger.info("Authenticated via JWT for user: %s", user_payload.get('sub', 'unknown'))
+        return sokosumi_token, user_payload, None
+
+    def _extract_credentials(self, scope: Scope) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Extract the API key and Bearer token for a request.
+
+        Query parameters are checked first for the API key. Headers are scanned
+        once in their raw ASGI form, matching x-api-key/token and Authorization
+        in the same pass; only the winning values are decoded.
+
+        Returns:
+            A (api_key, bearer_token) tuple; either may be None.
+        """
+        # Check query parameter first
+        api_key = _api_key_from_query(scope["query_string"])
         if api_key:
-            return api_key
+            return api_key, None
+
+        x_api_key = None
+        token_header = None
+        bearer = None
+        for name, value in scope["headers"]:
+            if name == b"x-api-key":
+                if x_api_key is None:
+                    x_api_key = value
+            elif name == b"token":
+                if token_header is None:
+                    token_header = value
+            elif name == b"authorization":
+                if bearer is None and value[:7].lower() == b"bearer ":
+                    bearer = value[7:].strip()  # Remove "Bearer " prefix
 
-        return None
+        # Check API key headers
+        api_key_header = x_api_key or token_header
+        if api_key_header:
+            return api_key_header.decode("latin-1"), None
 
-    def _extract_bearer_token(self, request: Request) -> Optional[str]:
-        """Extract Bearer token from Authorization header."""
-        auth_header = request.headers.get('authorization', '')
-        if auth_header.lower().startswith('bearer '):
-            return auth_header[7:]  # Remove "Bearer " prefix
-        return None
+        if bearer:
+            return None, bearer.decode("latin-1")
+        return None, None
 
     def _is_mcp_access_token(self, token: str) -> bool:
         """Return true only for JWTs issued by this MCP server."""
@@ -214,30 +418,77 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
         )
         return payload.get("iss") == MCP_SERVER_URL and has_expected_audience
 
+    async def _validate_mcp_access_token(self, token: str) -> Dict[str, Any]:
+        """
+        Validate an MCP access token, reusing recently verified payloads.
+
+        A cache hit skips the RS256 signature check; entries expire after
+        JWT_CACHE_TTL seconds or at the token's exp, whichever comes first.
+        """
+        cache_key = _cache_key(token)
+        payload = _jwt_payload_cache.get(cache_key)
+        if payload is not None and payload["exp"] > time.time():
+            return payload
+
+        payload = await validate_access_token(token)
+        ttl = min(JWT_CACHE_TTL, payload["exp"] - time.time())
+        if ttl > 0:
+            _jwt_payload_cache.set(cache_key, payload, ttl=ttl)
+        return payload
+
     async def _validate_sokosumi_bearer_token(self, token: str, network: str) -> bool:
-        """Validate a direct Sokosumi bearer token before allowing MCP access."""
-        base_url = get_base_url(network)
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json",
-        }
+        """
+        Validate a direct Sokosumi bearer token before allowing MCP access.
 
+        Successful validations are cached for BEARER_VALIDATION_TTL seconds, and
+        concurrent first-time lookups of the same token share one upstream call.
+        """
+        base_url = get_base_url(network)
+        cache_key = (base_url, _cache_key(token))
+        if _bearer_validation_cache.get(cache_key):
+            return True
+
+        validation = _inflight_bearer_validations.get(cache_key)
+        if validation is None:
+            validation = asyncio.ensure_future(
+                self._check_and_cache_bearer_token(token, base_url, cache_key)
+            )
+            _inflight_bearer_validations[cache_key] = validation
+            validation.add_done_callback(
+                lambda _: _inflight_bearer_validations.pop(cache_key, None)
+            )
+        # Shield so one cancelled request does not cancel the shared check
+        return await asyncio.shield(validation)
+
+    async def _check_and_cache_bearer_token(
+        self, token: str, base_url: str, cache_key: Tuple[str, bytes]
+    ) -> bool:
+        """Run the upstream check once and cache a positive result."""
+        valid = await self._check_sokosumi_bearer_token(token, base_url)
+        if valid:
+            _bearer_validation_cache.set(cache_key, True)
+        return valid
+
+    async def _check_sokosumi_bearer_token(self, token: str, base_url: str) -> bool:
+        """Ask the Sokosumi API whether a bearer token is accepted."""
+        headers = _bearer_headers(token)
+
+        client = get_http_client()
         try:
-            async with httpx.AsyncClient() as client:
-                for path in ("/v1/users/me", "/v1/coworkers/me"):
-                    response = await client.get(
-                        f"{base_url}{path}",
-                        headers=headers,
-                        timeout=10.0,
+            for path in ("/v1/users/me", "/v1/coworkers/me"):
+                response = await client.get(
+                    f"{base_url}{path}",
+                    headers=headers,
+                    timeout=10.0,
+                )
+                if 200 <= response.status_code < 300:
+                    return True
+                if response.status_code not in (401, 403):
+                    logger.warning(
+                        "Unexpected Sokosumi bearer validation response: %s %s",
+                        path,
+                        response.status_code,
                     )
-                    if 200 <= response.status_code < 300:
-                        return True
-                    if response.status_code not in (401, 403):
-                        logger.warning(
-                            "Unexpected Sokosumi bearer validation response: %s %s",
-                            path,
-                            response.status_code,
-                        )
         except httpx.HTTPError as e:
             logger.warning("Sokosumi bearer validation failed: %s", e)
 
@@ -245,36 +496,29 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
 
     def _unauthorized_response(self, detail: str) -> Response:
         """Return a 401 Unauthorized response with WWW-Authenticate header."""
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=401,
             content={"error": "Unauthorized", "detail": detail},
             headers={"WWW-Authenticate": get_www_authenticate_header()},
         )
 
-    def _cleanup_and_return(
-        self,
-        response: Response,
-        api_token,
-        network_token,
-        user_token,
-    ) -> Response:
-        """Clean up context variables and return response."""
-        if api_token:
-            try:
-                current_api_key.reset(api_token)
-            except:
-                pass
-        if network_token:
-            try:
-                current_network.reset(network_token)
-            except:
-                pass
-        if user_token:
-            try:
-                current_user.reset(user_token)
-            except:
-                pass
-        return response
+# Sokosumi API and web app base URLs per network, resolved once at import
+_EXPLICIT_BASE_URL = os.environ.get("SOKOSUMI_API_BASE_URL", "").rstrip("/")
+_DEFAULT_NETWORK = os.environ.get("SOKOSUMI_NETWORK") or "mainnet"
+_BASE_URLS = {
+    "preprod": os.environ.get(
+        "SOKOSUMI_PREPROD_API_BASE_URL",
+        "https://api.preprod.sokosumi.com",
+    ).rstrip("/"),
+    "mainnet": os.environ.get(
+        "SOKOSUMI_MAINNET_API_BASE_URL",
+        "https://api.sokosumi.com",
+    ).rstrip("/"),
+}
+_APP_URLS = {
+    "preprod": "https://preprod.sokosumi.com",
+    "mainnet": "https://app.sokosumi.com",
+}
 
 # Helper function to get the base URL based on network
 def get_base_url(network: Optional[str] = None) -> str:
@@ -287,44 +531,31 @@ def get_base_url(network: Optional[str] = None) -> str:
     Returns:
         The base URL for the API
     """
-    explicit_base_url = os.environ.get("SOKOSUMI_API_BASE_URL")
-    if explicit_base_url:
-        return explicit_base_url.rstrip("/")
+    if _EXPLICIT_BASE_URL:
+        return _EXPLICIT_BASE_URL
 
     if network is None:
-        network = (
-            current_network.get()
-            or networks.get('current')
-            or os.environ.get("SOKOSUMI_NETWORK")
-            or 'mainnet'
-        )
+        network = current_network.get() or _DEFAULT_NETWORK
 
-    if network == 'preprod':
-        return os.environ.get(
-            "SOKOSUMI_PREPROD_API_BASE_URL",
-            "https://api.preprod.sokosumi.com",
-        ).rstrip("/")
-    else:
-        return os.environ.get(
-            "SOKOSUMI_MAINNET_API_BASE_URL",
-            "https://api.sokosumi.com",
-        ).rstrip("/")
+    return _BASE_URLS.get(network, _BASE_URLS["mainnet"])
 
 # Helper function to get API key/token
 def get_current_api_key() -> Optional[str]:
     """
-    Get the current API key or OAuth token from context or storage.
+    Get the current API key or OAuth token from the request context or environment.
 
     Returns:
         The API key/token or None if not found
     """
-    return (
-        current_api_key.get()
-        or api_keys.get('current')
-        or os.environ.get("SOKOSUMI_API_KEY")
-        or os.environ.get("SOKOSUMI_AUTH_TOKEN")
-        or os.environ.get("API_KEY")
-    )
+    return _get_context_api_key() or _ENV_API_KEY
+
+
+def _bearer_headers(token: str) -> Dict[str, str]:
+    """Build the Sokosumi request headers for a token."""
+    return {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json",
+    }
 
 
 def get_auth_headers() -> Dict[str, str]:
@@ -338,10 +569,7 @@ def get_auth_headers() -> Dict[str, str]:
     if not token:
         return {}
 
-    return {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json",
-    }
+    return _bearer_headers(token)
 
 
 def auth_error() -> Dict[str, Any]:
@@ -355,6 +583,29 @@ def auth_error() -> Dict[str, Any]:
     }
 
 
+def _auth_guard(unauthenticated: Callable[[], Dict[str, Any]]) -> Callable:
+    """Build a tool decorator that returns unauthenticated() when no credential is set."""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not get_current_api_key():
+                return unauthenticated()
+            return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Tool decorators: plain tools return auth_error(), ChatGPT-compatible tools
+# wrap it in an MCP content array.
+require_auth = _auth_guard(auth_error)
+require_auth_content = _auth_guard(lambda: _text_content(auth_error()))
+
+
+# In-flight GET requests, keyed by (API key hash, URL, params). Concurrent tool
+# calls that issue the same read share one upstream round trip.
+_inflight_api_gets: Dict[Tuple[bytes, str, bytes], "asyncio.Future[Dict[str, Any]]"] = {}
+
+
 async def sokosumi_api_request(
     method: str,
     path: str,
@@ -368,6 +619,7 @@ async def sokosumi_api_request(
     if not api_key:
         return auth_error()
 
+    method = method.upper()
     base_url = get_base_url()
     url = f"{base_url}/{path.lstrip('/')}"
 
@@ -377,28 +629,56 @@ async def sokosumi_api_request(
         if value is not None and value != "" and value != []
     }
 
+    if method != "GET":
+        return await _send_api_request(method, url, path, clean_params, json_body, timeout)
+
+    inflight_key = (
+        _cache_key(api_key),
+        url,
+        orjson.dumps(clean_params, option=orjson.OPT_SORT_KEYS),
+    )
+    request = _inflight_api_gets.get(inflight_key)
+    if request is None:
+        request = asyncio.ensure_future(
+            _send_api_request(method, url, path, clean_params, None, timeout)
+        )
+        _inflight_api_gets[inflight_key] = request
+        request.add_done_callback(lambda _: _inflight_api_gets.pop(inflight_key, None))
+    # Shield so one cancelled caller does not cancel the shared request
+    return await asyncio.shield(request)
+
+
+async def _send_api_request(
+    method: str,
+    url: str,
+    path: str,
+    params: Dict[str, Any],
+    json_body: Optional[Dict[str, Any]],
+    timeout: float,
+) -> Dict[str, Any]:
+    """Send one request to the Sokosumi API and normalize the response."""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.request(
-                method.upper(),
-                url,
-                params=clean_params or None,
-                json=json_body,
-                headers=get_auth_headers(),
-                timeout=timeout,
-            )
+        client = get_http_client()
+        response = await client.request(
+            method,
+            url,
+            params=params or None,
+            json=json_body,
+            headers=get_auth_headers(),
+            timeout=timeout,
+        )
 
         if 200 <= response.status_code < 300:
             if not response.text:
                 return {"data": None}
             try:
-                return response.json()
+                return orjson.loads(response.content)
             except Exception:
                 return {"data": response.text}
 
         logger.error(
             "Sokosumi API request failed: %s %s -> %s - %s",
-            method.upper(),
+            method,
             url,
             response.status_code,
             response.text,
@@ -586,6 +866,7 @@ def hire_agent_prompt() -> str:
 
 
 @mcp.tool()
+@require_auth
 async def list_agents() -> Dict[str, Any]:
     """
     Lists all available AI agents with their pricing and capabilities.
@@ -601,39 +882,36 @@ async def list_agents() -> Dict[str, Any]:
         - isNew: Whether the agent is new
         - isShown: Whether the agent is shown
     """
-    api_key = get_current_api_key()
-    if not api_key:
-        return auth_error()
-
     base_url = get_base_url()
     url = f"{base_url}/v1/agents"
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                headers=get_auth_headers(),
-                timeout=30.0
-            )
+        client = get_http_client()
+        response = await client.get(
+            url,
+            headers=get_auth_headers(),
+            timeout=30.0
+        )
 
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"Successfully retrieved {len(data.get('data', []))} agents")
-                return data
-            else:
-                logger.error(f"Failed to list agents: {response.status_code} - {response.text}")
-                return {
-                    "error": f"Failed to list agents: {response.status_code}",
-                    "details": response.text
-                }
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            logger.info("Successfully retrieved %d agents", len(data.get('data', [])))
+            return data
+        else:
+            logger.error("Failed to list agents: %s - %s", response.status_code, response.text)
+            return {
+                "error": f"Failed to list agents: {response.status_code}",
+                "details": response.text
+            }
     except Exception as e:
-        logger.error(f"Error listing agents: {str(e)}")
+        logger.error("Error listing agents: %s", e)
         return {
             "error": "Failed to connect to Sokosumi API",
             "details": str(e)
         }
 
 @mcp.tool()
+@require_auth
 async def get_agent_input_schema(agent_id: str) -> Dict[str, Any]:
     """
     Gets the required input schema for a specific agent.
@@ -644,33 +922,29 @@ async def get_agent_input_schema(agent_id: str) -> Dict[str, Any]:
     Returns:
         The input schema for the agent, describing required parameters
     """
-    api_key = get_current_api_key()
-    if not api_key:
-        return auth_error()
-
     base_url = get_base_url()
     url = f"{base_url}/v1/agents/{agent_id}/input-schema"
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                headers=get_auth_headers(),
-                timeout=30.0
-            )
+        client = get_http_client()
+        response = await client.get(
+            url,
+            headers=get_auth_headers(),
+            timeout=30.0
+        )
 
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"Successfully retrieved input schema for agent {agent_id}")
-                return data
-            else:
-                logger.error(f"Failed to get input schema: {response.status_code} - {response.text}")
-                return {
-                    "error": f"Failed to get input schema: {response.status_code}",
-                    "details": response.text
-                }
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            logger.info("Successfully retrieved input schema for agent %s", agent_id)
+            return data
+        else:
+            logger.error("Failed to get input schema: %s - %s", response.status_code, response.text)
+            return {
+                "error": f"Failed to get input schema: {response.status_code}",
+                "details": response.text
+            }
     except Exception as e:
-        logger.error(f"Error getting input schema: {str(e)}")
+        logger.error("Error getting input schema: %s", e)
         return {
             "error": "Failed to connect to Sokosumi API",
             "details": str(e)
@@ -702,6 +976,7 @@ async def list_categories() -> Dict[str, Any]:
     return await sokosumi_api_request("GET", "/v1/categories")
 
 @mcp.tool()
+@require_auth
 async def create_job(
     agent_id: str,
     max_accepted_credits: float,
@@ -720,10 +995,6 @@ async def create_job(
     Returns:
         The created job details including job ID and status
     """
-    api_key = get_current_api_key()
-    if not api_key:
-        return auth_error()
-
     schema_response = await sokosumi_api_request(
         "GET",
         f"/v1/agents/{agent_id}/input-schema",
@@ -746,10 +1017,11 @@ async def create_job(
         json_body=body,
     )
     if not data.get("error"):
-        logger.info(f"Successfully created job for agent {agent_id}")
+        logger.info("Successfully created job for agent %s", agent_id)
     return data
 
 @mcp.tool()
+@require_auth
 async def get_job(job_id: str) -> Dict[str, Any]:
     """
     Retrieves status and results for a specific job.
@@ -765,33 +1037,29 @@ async def get_job(job_id: str) -> Dict[str, Any]:
         - price: Credits charged
         - timestamps: Various job lifecycle timestamps
     """
-    api_key = get_current_api_key()
-    if not api_key:
-        return auth_error()
-
     base_url = get_base_url()
     url = f"{base_url}/v1/jobs/{job_id}"
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                headers=get_auth_headers(),
-                timeout=30.0
-            )
+        client = get_http_client()
+        response = await client.get(
+            url,
+            headers=get_auth_headers(),
+            timeout=30.0
+        )
 
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"Successfully retrieved job {job_id}")
-                return data
-            else:
-                logger.error(f"Failed to get job: {response.status_code} - {response.text}")
-                return {
-                    "error": f"Failed to get job: {response.status_code}",
-                    "details": response.text
-                }
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            logger.info("Successfully retrieved job %s", job_id)
+            return data
+        else:
+            logger.error("Failed to get job: %s - %s", response.status_code, response.text)
+            return {
+                "error": f"Failed to get job: {response.status_code}",
+                "details": response.text
+            }
     except Exception as e:
-        logger.error(f"Error getting job: {str(e)}")
+        logger.error("Error getting job: %s", e)
         return {
             "error": "Failed to connect to Sokosumi API",
             "details": str(e)
@@ -799,6 +1067,7 @@ async def get_job(job_id: str) -> Dict[str, Any]:
 
 
 @mcp.tool()
+@require_auth
 async def list_agent_jobs(agent_id: str) -> Dict[str, Any]:
     """
     Lists all jobs for a specific agent belonging to the authenticated user.
@@ -809,39 +1078,36 @@ async def list_agent_jobs(agent_id: str) -> Dict[str, Any]:
     Returns:
         List of jobs for the specified agent with full job details
     """
-    api_key = get_current_api_key()
-    if not api_key:
-        return auth_error()
-
     base_url = get_base_url()
     url = f"{base_url}/v1/agents/{agent_id}/jobs"
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                headers=get_auth_headers(),
-                timeout=30.0
-            )
+        client = get_http_client()
+        response = await client.get(
+            url,
+            headers=get_auth_headers(),
+            timeout=30.0
+        )
 
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"Successfully retrieved {len(data.get('data', []))} jobs for agent {agent_id}")
-                return data
-            else:
-                logger.error(f"Failed to list agent jobs: {response.status_code} - {response.text}")
-                return {
-                    "error": f"Failed to list agent jobs: {response.status_code}",
-                    "details": response.text
-                }
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            logger.info("Successfully retrieved %d jobs for agent %s", len(data.get('data', [])), agent_id)
+            return data
+        else:
+            logger.error("Failed to list agent jobs: %s - %s", response.status_code, response.text)
+            return {
+                "error": f"Failed to list agent jobs: {response.status_code}",
+                "details": response.text
+            }
     except Exception as e:
-        logger.error(f"Error listing agent jobs: {str(e)}")
+        logger.error("Error listing agent jobs: %s", e)
         return {
             "error": "Failed to connect to Sokosumi API",
             "details": str(e)
         }
 
 @mcp.tool()
+@require_auth
 async def get_user_profile() -> Dict[str, Any]:
     """
     Gets the current user's profile information.
@@ -855,33 +1121,29 @@ async def get_user_profile() -> Dict[str, Any]:
         - marketingOptIn: Marketing preference
         - timestamps: Account creation/update times
     """
-    api_key = get_current_api_key()
-    if not api_key:
-        return auth_error()
-
     base_url = get_base_url()
     url = f"{base_url}/v1/users/me"
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                headers=get_auth_headers(),
-                timeout=30.0
-            )
+        client = get_http_client()
+        response = await client.get(
+            url,
+            headers=get_auth_headers(),
+            timeout=30.0
+        )
 
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"Successfully retrieved user profile")
-                return data
-            else:
-                logger.error(f"Failed to get user profile: {response.status_code} - {response.text}")
-                return {
-                    "error": f"Failed to get user profile: {response.status_code}",
-                    "details": response.text
-                }
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            logger.info("Successfully retrieved user profile")
+            return data
+        else:
+            logger.error("Failed to get user profile: %s - %s", response.status_code, response.text)
+            return {
+                "error": f"Failed to get user profile: {response.status_code}",
+                "details": response.text
+            }
     except Exception as e:
-        logger.error(f"Error getting user profile: {str(e)}")
+        logger.error("Error getting user profile: %s", e)
         return {
             "error": "Failed to connect to Sokosumi API",
             "details": str(e)
@@ -1301,7 +1563,65 @@ async def provide_job_input(
 # ChatGPT Compatibility Tools
 # These tools are required for ChatGPT Connectors and deep research functionality
 
+# Agent catalogue for search(), keyed by (API base URL, token hash). Each entry
+# pairs every agent with its lower-cased search text, built once per fetch.
+AGENT_INDEX_TTL = 60.0
+_agent_index_cache = TTLCache(maxsize=256, ttl=AGENT_INDEX_TTL)
+
+# Upper bound on results returned by search()
+MAX_SEARCH_RESULTS = 20
+
+# In-flight background catalogue fetches, keyed like _agent_index_cache
+AGENT_INDEX_PREFETCH_TIMEOUT = 2.0
+_agent_index_prefetches: Dict[Tuple[str, bytes], asyncio.Task] = {}
+
+
+def _build_agent_index(agents: list) -> list:
+    """Pair each agent with its lower-cased name, description, and tags."""
+    return [
+        (
+            f"{agent.get('name', '')} {agent.get('description', '')} "
+            f"{' '.join(agent.get('tags') or [])}".lower(),
+            agent,
+        )
+        for agent in agents
+    ]
+
+async def _prefetch_agent_index(token: str, base_url: str, cache_key: Tuple[str, bytes]) -> None:
+    """Fetch the agent catalogue into _agent_index_cache, ignoring failures."""
+    try:
+        client = get_http_client()
+        response = await asyncio.wait_for(
+            client.get(f"{base_url}/v1/agents", headers=_bearer_headers(token)),
+            timeout=AGENT_INDEX_PREFETCH_TIMEOUT,
+        )
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            _agent_index_cache.set(cache_key, _build_agent_index(data.get('data', [])))
+    except Exception as e:
+        logger.debug("Agent index prefetch failed: %s", e)
+    finally:
+        _agent_index_prefetches.pop(cache_key, None)
+
+
+def prefetch_agent_index(token: str, base_url: str) -> None:
+    """
+    Start a best-effort background fetch of the caller's agent catalogue.
+
+    Called by the middleware when an authenticated MCP session starts, so the
+    first search() of a session usually finds a warm index. Does nothing when the index is
+    already cached or being fetched.
+    """
+    cache_key = (base_url, _cache_key(token))
+    if cache_key in _agent_index_prefetches or _agent_index_cache.get(cache_key) is not None:
+        return
+    _agent_index_prefetches[cache_key] = asyncio.create_task(
+        _prefetch_agent_index(token, base_url, cache_key)
+    )
+
+
 @mcp.tool()
+@require_auth_content
 async def search(query: str) -> Dict[str, Any]:
     """
     Search for relevant Sokosumi AI agents based on a query.
@@ -1316,23 +1636,21 @@ async def search(query: str) -> Dict[str, Any]:
         MCP content array with JSON-encoded search results containing:
         - results: Array of result objects with id, title, and url
     """
-    import json
-
     api_key = get_current_api_key()
-    if not api_key:
-        return {
-            "content": [{
-                "type": "text",
-                "text": json.dumps(auth_error())
-            }]
-        }
 
-    # Get all agents first
+    # Get all agents first (from the short-lived per-user index when warm)
     base_url = get_base_url()
     url = f"{base_url}/v1/agents"
+    cache_key = (base_url, _cache_key(api_key))
 
     try:
-        async with httpx.AsyncClient() as client:
+        agent_index = _agent_index_cache.get(cache_key)
+        if agent_index is None and cache_key in _agent_index_prefetches:
+            # The middleware is already fetching this catalogue; wait for it
+            await asyncio.wait([_agent_index_prefetches[cache_key]])
+            agent_index = _agent_index_cache.get(cache_key)
+        if agent_index is None:
+            client = get_http_client()
             response = await client.get(
                 url,
                 headers=get_auth_headers(),
@@ -1340,61 +1658,47 @@ async def search(query: str) -> Dict[str, Any]:
             )
 
             if response.status_code != 200:
-                logger.error(f"Failed to list agents: {response.status_code} - {response.text}")
-                return {
-                    "content": [{
-                        "type": "text",
-                        "text": json.dumps({"error": f"Failed to list agents: {response.status_code}"})
-                    }]
-                }
-
-            data = response.json()
-            agents = data.get('data', [])
-
-            # Filter agents based on query (simple text matching)
-            query_lower = query.lower()
-            filtered_agents = []
-
-            for agent in agents:
-                agent_text = f"{agent.get('name', '')} {agent.get('description', '')} {' '.join(agent.get('tags', []))}".lower()
-                if query_lower in agent_text:
-                    filtered_agents.append(agent)
-
-            # If no matches, return all agents (fallback)
-            if not filtered_agents:
-                filtered_agents = agents
-
-            # Format results for ChatGPT
-            network = current_network.get() or networks.get('current', 'mainnet')
-            base_agent_url = 'https://app.sokosumi.com' if network == 'mainnet' else 'https://preprod.sokosumi.com'
-
-            results = []
-            for agent in filtered_agents[:20]:  # Limit to 20 results
-                results.append({
-                    "id": agent.get('id', ''),
-                    "title": f"{agent.get('name', 'Unnamed Agent')} - {agent.get('price', 0)} credits",
-                    "url": f"{base_agent_url}/agents/{agent.get('id', '')}"
-                })
+                logger.error("Failed to list agents: %s - %s", response.status_code, response.text)
+                return _text_content({"error": f"Failed to list agents: {response.status_code}"})
+
+            data = orjson.loads(response.content)
+            agent_index = _build_agent_index(data.get('data', []))
+            _agent_index_cache.set(cache_key, agent_index)
+
+        # Filter agents based on query (simple text matching), stopping
+        # as soon as enough matches have been found
+        query_lower = query.lower()
+        filtered_agents = list(islice(
+            (agent for agent_text, agent in agent_index if query_lower in agent_text),
+            MAX_SEARCH_RESULTS,
+        ))
+
+        # If no matches, return all agents (fallback)
+        if not filtered_agents:
+            filtered_agents = [agent for _, agent in agent_index[:MAX_SEARCH_RESULTS]]
+
+        # Format results for ChatGPT
+        network = current_network.get() or 'mainnet'
+        base_agent_url = _APP_URLS.get(network, _APP_URLS["mainnet"])
+
+        results = []
+        for agent in filtered_agents:
+            results.append({
+                "id": agent.get('id', ''),
+                "title": f"{agent.get('name', 'Unnamed Agent')} - {agent.get('price', 0)} credits",
+                "url": f"{base_agent_url}/agents/{agent.get('id', '')}"
+            })
 
-            logger.info(f"Search for '{query}' returned {len(results)} results")
+        logger.info("Search for '%s' returned %d results", query, len(results))
 
-            return {
-                "content": [{
-                    "type": "text",
-                    "text": json.dumps({"results": results})
-                }]
-            }
+        return _text_content({"results": results})
 
     except Exception as e:
-        logger.error(f"Error searching agents: {str(e)}")
-        return {
-            "content": [{
-                "type": "text",
-                "text": json.dumps({"error": f"Failed to search agents: {str(e)}"})
-            }]
-        }
+        logger.error("Error searching agents: %s", e)
+        return _text_content({"error": f"Failed to search agents: {str(e)}"})
 
 @mcp.tool()
+@require_auth_content
 async def fetch(id: str) -> Dict[str, Any]:
     """
     Fetch detailed information about a specific Sokosumi AI agent.
@@ -1413,153 +1717,270 @@ async def fetch(id: str) -> Dict[str, Any]:
         - url: Link to agent page
         - metadata: Additional agent metadata
     """
-    import json
-
-    api_key = get_current_api_key()
-    if not api_key:
-        return {
-            "content": [{
-                "type": "text",
-                "text": json.dumps(auth_error())
-            }]
-        }
-
     base_url = get_base_url()
 
     try:
         # Get agent details and input schema in parallel
-        async with httpx.AsyncClient() as client:
-            # Get agent list to find specific agent
-            agents_response = await client.get(
-                f"{base_url}/v1/agents",
-                headers=get_auth_headers(),
+        client = get_http_client()
+        headers = get_auth_headers()
+        agent_response, schema_response = await asyncio.gather(
+            client.get(
+                f"{base_url}/v1/agents/{id}",
+                headers=headers,
                 timeout=30.0
-            )
+            ),
+            client.get(
+                f"{base_url}/v1/agents/{id}/input-schema",
+                headers=headers,
+                timeout=30.0
+            ),
+        )
 
-            if agents_response.status_code != 200:
-                logger.error(f"Failed to list agents: {agents_response.status_code}")
-                return {
-                    "content": [{
-                        "type": "text",
-                        "text": json.dumps({"error": f"Failed to fetch agent details: {agents_response.status_code}"})
-                    }]
-                }
+        agent = None
+        if agent_response.status_code == 200:
+            agent_data = orjson.loads(agent_response.content)
+            agent = agent_data.get('data') if isinstance(agent_data, dict) else None
+        elif agent_response.status_code != 404:
+            logger.error("Failed to get agent: %s", agent_response.status_code)
+            return _text_content({"error": f"Failed to fetch agent details: {agent_response.status_code}"})
+
+        if not isinstance(agent, dict) or not agent:
+            return _text_content({"error": f"Agent with id '{id}' not found"})
+
+        input_schema = {}
+        if schema_response.status_code == 200:
+            input_schema = orjson.loads(schema_response.content).get('data', {})
+
+        # Format full text content
+        network = current_network.get() or 'mainnet'
+        base_agent_url = _APP_URLS.get(network, _APP_URLS["mainnet"])
+
+        # Build comprehensive text description
+        text_parts = []
+        text_parts.append(f"Agent: {agent.get('name', 'Unnamed Agent')}")
+        text_parts.append(f"Description: {agent.get('description', 'No description available')}")
+        text_parts.append(f"Price: {agent.get('price', 0)} credits")
+        text_parts.append(f"Status: {agent.get('status', 'unknown')}")
+
+        if agent.get('tags'):
+            text_parts.append(f"Tags: {', '.join(agent.get('tags', []))}")
+
+        if input_schema:
+            text_parts.append("\nInput Schema:")
+            text_parts.append(_json_text(input_schema, orjson.OPT_INDENT_2))
+
+        text_parts.append(f"\nTo use this agent:")
+        text_parts.append(f"1. Get input schema: get_agent_input_schema('{id}')")
+        text_parts.append(f"2. Create job: create_job(agent_id='{id}', max_accepted_credits={agent.get('price', 100)}, input_data={{...}})")
+        text_parts.append(f"3. Monitor job: get_job(job_id)")
+
+        full_text = "\n".join(text_parts)
+
+        result = {
+            "id": id,
+            "title": f"{agent.get('name', 'Unnamed Agent')} - {agent.get('price', 0)} credits",
+            "text": full_text,
+            "url": f"{base_agent_url}/agents/{id}",
+            "metadata": {
+                "source": "sokosumi_api",
+                "network": network,
+                "agent_status": agent.get('status', 'unknown'),
+                "price_credits": agent.get('price', 0),
+                "tags": agent.get('tags', []),
+                "has_input_schema": bool(input_schema)
+            }
+        }
 
-            agents_data = agents_response.json()
-            agents = agents_data.get('data', [])
-
-            # Find the specific agent
-            agent = None
-            for a in agents:
-                if a.get('id') == id:
-                    agent = a
-                    break
-
-            if not agent:
-                return {
-                    "content": [{
-                        "type": "text",
-                        "text": json.dumps({"error": f"Agent with id '{id}' not found"})
-                    }]
-                }
+        logger.info("Successfully fetched agent details for %s", id)
 
-            # Get input schema
-            schema_response = await client.get(
-                f"{base_url}/v1/agents/{id}/input-schema",
-                headers=get_auth_headers(),
-                timeout=30.0
-            )
+        return _text_content(result)
 
-            input_schema = {}
-            if schema_response.status_code == 200:
-                input_schema = schema_response.json().get('data', {})
+    except Exception as e:
+        logger.error("Error fetching agent %s: %s", id, e)
+        return _text_content({"error": f"Failed to fetch agent: {str(e)}"})
 
-            # Format full text content
-            network = current_network.get() or networks.get('current', 'mainnet')
-            base_agent_url = 'https://app.sokosumi.com' if network == 'mainnet' else 'https://preprod.sokosumi.com'
 
-            # Build comprehensive text description
-            text_parts = []
-            text_parts.append(f"Agent: {agent.get('name', 'Unnamed Agent')}")
-            text_parts.append(f"Description: {agent.get('description', 'No description available')}")
-            text_parts.append(f"Price: {agent.get('price', 0)} credits")
-            text_parts.append(f"Status: {agent.get('status', 'unknown')}")
+# ============================================================================
+# OAuth 2.1 Endpoint Handlers (Self-Contained Authorization Server)
+# ============================================================================
 
-            if agent.get('tags'):
-                text_parts.append(f"Tags: {', '.join(agent.get('tags', []))}")
+# Serialized discovery documents and their ETags. These only depend on
+# configuration and the signing key, so each is rendered once per process.
+_static_json_bodies: Dict[str, Tuple[bytes, str]] = {}
+STATIC_METADATA_CACHE_CONTROL = "public, max-age=3600"
 
-            if input_schema:
-                text_parts.append("\nInput Schema:")
-                text_parts.append(json.dumps(input_schema, indent=2))
+# Builders for the documents served by _static_json_response, by name
+_STATIC_JSON_DOCUMENTS: Dict[str, Callable[[], Dict[str, Any]]] = {
+    "protected_resource": get_protected_resource_metadata,
+    "authorization_server": get_authorization_server_metadata,
+    "jwks": get_jwks,
+}
 
-            text_parts.append(f"\nTo use this agent:")
-            text_parts.append(f"1. Get input schema: get_agent_input_schema('{id}')")
-            text_parts.append(f"2. Create job: create_job(agent_id='{id}', max_accepted_credits={agent.get('price', 100)}, input_data={{...}})")
-            text_parts.append(f"3. Monitor job: get_job(job_id)")
 
-            full_text = "\n".join(text_parts)
+def _render_static_json(name: str) -> Tuple[bytes, str]:
+    """Serialize a static document and compute its ETag."""
+    body = orjson.dumps(_STATIC_JSON_DOCUMENTS[name]())
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    _static_json_bodies[name] = (body, etag)
+    return body, etag
 
-            result = {
-                "id": id,
-                "title": f"{agent.get('name', 'Unnamed Agent')} - {agent.get('price', 0)} credits",
-                "text": full_text,
-                "url": f"{base_agent_url}/agents/{id}",
-                "metadata": {
-                    "source": "sokosumi_api",
-                    "network": network,
-                    "agent_status": agent.get('status', 'unknown'),
-                    "price_credits": agent.get('price', 0),
-                    "tags": agent.get('tags', []),
-                    "has_input_schema": bool(input_schema)
-                }
-            }
 
-            logger.info(f"Successfully fetched agent details for {id}")
+def warm_static_json() -> None:
+    """Pre-render every static document so the first request is a cache hit."""
+    for name in _STATIC_JSON_DOCUMENTS:
+        _render_static_json(name)
 
-            return {
-                "content": [{
-                    "type": "text",
-                    "text": json.dumps(result)
-                }]
-            }
 
-    except Exception as e:
-        logger.error(f"Error fetching agent {id}: {str(e)}")
-        return {
-            "content": [{
-                "type": "text",
-                "text": json.dumps({"error": f"Failed to fetch agent: {str(e)}"})
-            }]
-        }
+def _static_json_response(request: Request, name: str) -> Response:
+    """Serve a pre-rendered JSON document, answering 304 for a matching ETag."""
+    cached = _static_json_bodies.get(name)
+    body, etag = cached if cached is not None else _render_static_json(name)
 
+    headers = {"Cache-Control": STATIC_METADATA_CACHE_CONTROL, "ETag": etag}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    ):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
-# ============================================================================
-# OAuth 2.1 Endpoint Handlers (Self-Contained Authorization Server)
-# ============================================================================
 
-async def oauth_protected_resource_metadata(request: Request) -> JSONResponse:
+async def oauth_protected_resource_metadata(request: Request) -> Response:
     """
     Serve OAuth 2.0 Protected Resource Metadata (RFC 9728).
 
     This endpoint tells MCP clients where to authenticate.
     """
-    return JSONResponse(get_protected_resource_metadata())
+    return _static_json_response(request, "protected_resource")
 
 
-async def oauth_authorization_server_metadata(request: Request) -> JSONResponse:
+async def oauth_authorization_server_metadata(request: Request) -> Response:
     """
     Serve OAuth 2.0 Authorization Server Metadata (RFC 8414).
 
     This endpoint tells MCP clients the OAuth endpoints.
     """
-    return JSONResponse(get_authorization_server_metadata())
+    return _static_json_response(request, "authorization_server")
 
 
-async def oauth_jwks(request: Request) -> JSONResponse:
+async def oauth_jwks(request: Request) -> Response:
     """
     Serve the JWKS (JSON Web Key Set) for token verification.
     """
-    return JSONResponse(get_jwks())
+    return _static_json_response(request, "jwks")
+
+
+# OAuth error page, encoded once. Only the message paragraphs vary per request
+# and are spliced in with a bytes replace.
+_AUTH_ERROR_PAGE = b"""
+            <!DOCTYPE html>
+            <html>
+            <head><title>Authentication Error</title></head>
+            <body style="font-family: sans-serif; padding: 40px; text-align: center;">
+                <h1>Authentication Failed</h1>
+                <<MESSAGE>>
+                <p><a href="https://app.sokosumi.com">Return to Sokosumi</a></p>
+            </body>
+            </html>
+            """
+
+
+def _render_auth_error_page(*paragraphs: str) -> bytes:
+    """Render the OAuth error page body; each paragraph is HTML-escaped."""
+    message = "\n                ".join(f"<p>{html.escape(text)}</p>" for text in paragraphs)
+    return _AUTH_ERROR_PAGE.replace(b"<<MESSAGE>>", message.encode("utf-8"))
+
+
+def _auth_error_page(*paragraphs: str, status_code: int) -> HTMLResponse:
+    """Build an OAuth error page response."""
+    return HTMLResponse(content=_render_auth_error_page(*paragraphs), status_code=status_code)
+
+
+def _accepts_gzip(request: Request) -> bool:
+    """
+    Return true if the client's Accept-Encoding allows a gzip body.
+
+    An explicit gzip entry decides on its own; "*" only applies when gzip is
+    not listed, so "*;q=1, gzip;q=0" refuses gzip.
+    """
+    wildcard = None
+    for coding in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = coding.partition(";")
+        name = name.strip().lower()
+        if name not in ("gzip", "*"):
+            continue
+        _, _, q = params.partition("q=")
+        try:
+            accepted = float(q) > 0 if q.strip() else True
+        except ValueError:
+            accepted = True
+        if name == "gzip":
+            return accepted
+        if wildcard is None:
+            wildcard = accepted
+    return bool(wildcard)
+
+
+def _oauth_error(error: str, description: str, status_code: int = 400) -> ORJSONResponse:
+    """Build an OAuth error response."""
+    return ORJSONResponse(
+        status_code=status_code,
+        content={"error": error, "error_description": description},
+    )
+
+
+# Upper bound on fields parsed from an OAuth query string or token request body
+MAX_OAUTH_FIELDS = 32
+
+
+def _parse_urlencoded(data: str) -> Dict[str, str]:
+    """
+    Parse urlencoded data into a dict in a single pass (last value wins).
+
+    Raises:
+        ValueError: If the data has more than MAX_OAUTH_FIELDS fields
+    """
+    return dict(parse_qsl(data, keep_blank_values=True, max_num_fields=MAX_OAUTH_FIELDS))
+
+
+# The upstream-failure callback page has no request-specific content, so it is
+# rendered (and gzipped) once at import and reused.
+_CALLBACK_UPSTREAM_ERROR_HTML = _render_auth_error_page(
+    "An unexpected error occurred. Please try again."
+)
+_CALLBACK_UPSTREAM_ERROR_HTML_GZ = gzip.compress(_CALLBACK_UPSTREAM_ERROR_HTML, compresslevel=9, mtime=0)
+
+
+def _callback_upstream_error(request: Request) -> HTMLResponse:
+    """Serve the pre-rendered 502 callback page, gzipped when accepted."""
+    if _accepts_gzip(request):
+        return HTMLResponse(
+            _CALLBACK_UPSTREAM_ERROR_HTML_GZ,
+            status_code=502,
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+        )
+    return HTMLResponse(
+        _CALLBACK_UPSTREAM_ERROR_HTML,
+        status_code=502,
+        headers={"Vary": "Accept-Encoding"},
+    )
+
+# Authorization request validation errors. These carry no request-specific
+# data, so one response object per error is built at import and reused.
+_ERR_UNSUPPORTED_RESPONSE_TYPE = _oauth_error(
+    "unsupported_response_type", "Only 'code' response type is supported"
+)
+_ERR_MISSING_CLIENT_ID = _oauth_error("invalid_request", "client_id is required")
+_ERR_MISSING_REDIRECT_URI = _oauth_error("invalid_request", "redirect_uri is required")
+_ERR_INVALID_REDIRECT_URI = _oauth_error("invalid_request", "redirect_uri is not registered")
+_ERR_MISSING_CODE_CHALLENGE = _oauth_error(
+    "invalid_request", "code_challenge is required (PKCE)"
+)
+_ERR_INVALID_CODE_CHALLENGE_METHOD = _oauth_error(
+    "invalid_request", "code_challenge_method must be S256"
+)
+_ERR_TOO_MANY_PARAMETERS = _oauth_error("invalid_request", "Too many parameters")
 
 
 async def oauth_authorize(request: Request) -> Response:
@@ -1569,47 +1990,34 @@ async def oauth_authorize(request: Request) -> Response:
     Redirects to Sokosumi's OAuth provider for authentication.
     Supports PKCE (required by MCP spec).
     """
-    # Extract OAuth parameters from mcp-remote
-    client_id = request.query_params.get("client_id", "")
-    redirect_uri = request.query_params.get("redirect_uri", "")
-    response_type = request.query_params.get("response_type", "")
-    scope = request.query_params.get("scope", "mcp:read mcp:write")
-    state = request.query_params.get("state", "")
-    code_challenge = request.query_params.get("code_challenge", "")
-    code_challenge_method = request.query_params.get("code_challenge_method", "")
-    resource = request.query_params.get("resource")
+    # Extract OAuth parameters from mcp-remote (parse the query once)
+    try:
+        params = _parse_urlencoded(request.scope["query_string"].decode("latin-1"))
+    except ValueError:
+        return _ERR_TOO_MANY_PARAMETERS
+    client_id = params.get("client_id", "")
+    redirect_uri = params.get("redirect_uri", "")
+    response_type = params.get("response_type", "")
+    scope = params.get("scope", "mcp:read mcp:write")
+    state = params.get("state", "")
+    code_challenge = params.get("code_challenge", "")
+    code_challenge_method = params.get("code_challenge_method", "")
+    resource = params.get("resource")
 
     # Validate required parameters
     if response_type != "code":
-        return JSONResponse(
-            status_code=400,
-            content={"error": "unsupported_response_type", "error_description": "Only 'code' response type is supported"},
-        )
-
+        return _ERR_UNSUPPORTED_RESPONSE_TYPE
     if not client_id:
-        return JSONResponse(
-            status_code=400,
-            content={"error": "invalid_request", "error_description": "client_id is required"},
-        )
-
+        return _ERR_MISSING_CLIENT_ID
     if not redirect_uri:
-        return JSONResponse(
-            status_code=400,
-            content={"error": "invalid_request", "error_description": "redirect_uri is required"},
-        )
-
+        return _ERR_MISSING_REDIRECT_URI
+    if not is_allowed_redirect_uri(redirect_uri):
+        return _ERR_INVALID_REDIRECT_URI
     # PKCE is required per MCP spec
     if not code_challenge:
-        return JSONResponse(
-            status_code=400,
-            content={"error": "invalid_request", "error_description": "code_challenge is required (PKCE)"},
-        )
-
+        return _ERR_MISSING_CODE_CHALLENGE
     if code_challenge_method != "S256":
-        return JSONResponse(
-            status_code=400,
-            content={"error": "invalid_request", "error_description": "code_challenge_method must be S256"},
-        )
+        return _ERR_INVALID_CODE_CHALLENGE_METHOD
 
     # Create MCP session to track mcp-remote's request
     mcp_session_id = create_mcp_session(
@@ -1624,11 +2032,86 @@ async def oauth_authorize(request: Request) -> Response:
 
     # Build Sokosumi OAuth URL and redirect user there
     sokosumi_auth_url = build_sokosumi_auth_url(mcp_session_id)
-    logger.info(f"OAuth authorize: redirecting to Sokosumi for session {mcp_session_id[:8]}...")
+    logger.info("OAuth authorize: redirecting to Sokosumi for session %.8s...", mcp_session_id)
 
     return RedirectResponse(url=sokosumi_auth_url, status_code=302)
 
 
+# Total time budget for the userinfo request before the callback falls back
+USER_INFO_TIMEOUT = 2.0
+
+
+def _user_id_from_id_token(id_token: Optional[str]) -> Optional[str]:
+    """
+    Read the subject claim from a Sokosumi id_token.
+
+    The id_token comes straight from Sokosumi's token endpoint over TLS, so
+    (per OIDC Core 3.1.3.7) the TLS server check stands in for verifying its
+    signature. The issuer, audience and expiry are still checked. Returns None
+    when any check fails or there is no usable sub claim, so the caller falls
+    back to userinfo.
+    """
+    if not id_token or not OAUTH_CLIENT_ID:
+        return None
+    try:
+        claims = jwt.decode(
+            id_token,
+            audience=OAUTH_CLIENT_ID,
+            issuer=SOKOSUMI_OAUTH_ISSUER,
+            options={
+                "verify_signature": False,
+                "verify_aud": True,
+                "verify_iss": True,
+                "verify_exp": True,
+                "require": ["iss", "aud", "exp", "sub"],
+            },
+        )
+    except jwt.InvalidTokenError as e:
+        logger.warning("Ignoring Sokosumi id_token, falling back to userinfo: %s", e)
+        return None
+    # A list audience must carry azp naming this client, and any azp present
+    # must match it (OIDC Core 3.1.3.7)
+    azp = claims.get("azp")
+    if (isinstance(claims["aud"], list) or azp is not None) and azp != OAUTH_CLIENT_ID:
+        logger.warning("Ignoring Sokosumi id_token, falling back to userinfo: azp mismatch")
+        return None
+    user_id = claims.get("sub")
+    return user_id if isinstance(user_id, str) and user_id else None
+
+
+async def _get_sokosumi_user_id(access_token: str) -> str:
+    """Resolve the Sokosumi user id for a freshly issued access token."""
+    client = get_http_client()
+    try:
+        user_response = await asyncio.wait_for(
+            client.get(
+                SOKOSUMI_USERINFO_ENDPOINT,
+                headers=[(b"Authorization", b"Bearer " + access_token.encode("ascii"))],
+            ),
+            timeout=USER_INFO_TIMEOUT,
+        )
+    except (asyncio.TimeoutError, httpx.TimeoutException):
+        logger.warning("Sokosumi user info timed out after %ss", USER_INFO_TIMEOUT)
+        return "authenticated_user"
+
+    if user_response.status_code != 200:
+        logger.warning("Could not get user info from Sokosumi: %s", user_response.status_code)
+        return "authenticated_user"
+
+    user_info = orjson.loads(user_response.content)
+    user_data = user_info.get("data", user_info) if isinstance(user_info, dict) else None
+    if not isinstance(user_data, dict):
+        logger.warning("Unexpected Sokosumi user info shape: %s", type(user_data).__name__)
+        return "authenticated_user"
+    return (
+        user_data.get("sub")
+        or user_data.get("id")
+        or user_data.get("userId")
+        or user_data.get("email")
+        or "authenticated_user"
+    )
+
+
 async def oauth_callback(request: Request) -> Response:
     """
     OAuth Callback Endpoint.
@@ -1636,33 +2119,23 @@ async def oauth_callback(request: Request) -> Response:
     Handles the callback from Sokosumi OAuth after user authentication.
     Exchanges Sokosumi's code for tokens, then redirects back to mcp-remote.
     """
-    # Extract callback parameters from Sokosumi
-    code = request.query_params.get("code", "")
-    state = request.query_params.get("state", "")
-    error = request.query_params.get("error", "")
-    error_description = request.query_params.get("error_description", "")
+    # Extract callback parameters from Sokosumi (parse the query once)
+    try:
+        params = _parse_urlencoded(request.scope["query_string"].decode("latin-1"))
+    except ValueError:
+        return _ERR_TOO_MANY_PARAMETERS
+    code = params.get("code", "")
+    state = params.get("state", "")
+    error = params.get("error", "")
+    error_description = params.get("error_description", "")
 
     # Handle errors from Sokosumi
     if error:
-        logger.error(f"Sokosumi OAuth error: {error} - {error_description}")
-        return HTMLResponse(
-            content=f"""
-            <!DOCTYPE html>
-            <html>
-            <head><title>Authentication Error</title></head>
-            <body style="font-family: sans-serif; padding: 40px; text-align: center;">
-                <h1>Authentication Failed</h1>
-                <p>Error: {error}</p>
-                <p>{error_description}</p>
-                <p><a href="https://app.sokosumi.com">Return to Sokosumi</a></p>
-            </body>
-            </html>
-            """,
-            status_code=400,
-        )
+        logger.error("Sokosumi OAuth error: %s - %s", error, error_description)
+        return _auth_error_page(f"Error: {error}", error_description, status_code=400)
 
     if not code or not state:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=400,
             content={"error": "invalid_request", "error_description": "Missing code or state"},
         )
@@ -1674,28 +2147,12 @@ async def oauth_callback(request: Request) -> Response:
         sokosumi_refresh_token = sokosumi_tokens.get("refresh_token")
         mcp_session_id = sokosumi_tokens["mcp_session_id"]
 
-        # Get user info from Sokosumi using the access token
-        async with httpx.AsyncClient() as client:
-            user_response = await client.get(
-                SOKOSUMI_USERINFO_ENDPOINT,
-                headers={"Authorization": f"Bearer {sokosumi_access_token}"},
-                timeout=10.0,
-            )
-
-            if user_response.status_code == 200:
-                user_info = user_response.json()
-                user_data = user_info.get("data", user_info) if isinstance(user_info, dict) else {}
-                user_id = (
-                    user_data.get("sub")
-                    or user_data.get("id")
-                    or user_data.get("userId")
-                    or user_data.get("email")
-                    or "authenticated_user"
-                )
-            else:
-                # Fallback: extract from id_token if available
-                user_id = "authenticated_user"
-                logger.warning(f"Could not get user info from Sokosumi: {user_response.status_code}")
+        # Identify the user from the id_token when Sokosumi returned one, and
+        # only fall back to a userinfo round trip without it
+        user_id = (
+            _user_id_from_id_token(sokosumi_tokens.get("id_token"))
+            or await _get_sokosumi_user_id(sokosumi_access_token)
+        )
 
         # Get the MCP session to retrieve mcp-remote's redirect_uri and state
         mcp_session = get_mcp_session(mcp_session_id)
@@ -1711,50 +2168,64 @@ async def oauth_callback(request: Request) -> Response:
             sokosumi_refresh_token=sokosumi_refresh_token,
         )
 
-        # Redirect back to mcp-remote with MCP's auth code
-        redirect_params = {
-            "code": mcp_code,
-            "state": mcp_session["state"],
-        }
-
-        redirect_url = f"{mcp_session['redirect_uri']}?{urlencode(redirect_params)}"
-        logger.info(f"OAuth callback successful, redirecting to mcp-remote: {redirect_url[:50]}...")
+        # Redirect back to mcp-remote with MCP's auth code. The code is
+        # URL-safe base64, so it needs no quoting; the client's opaque state
+        # was quoted once when the session was created.
+        redirect_url = (
+            f"{mcp_session['redirect_uri']}{mcp_session['redirect_separator']}"
+            f"code={mcp_code}&state={mcp_session['state_encoded']}"
+        )
+        logger.info("OAuth callback successful, redirecting to mcp-remote: %.50s...", redirect_url)
 
         return RedirectResponse(url=redirect_url, status_code=302)
 
     except ValueError as e:
-        logger.error(f"OAuth callback error: {e}")
-        return HTMLResponse(
-            content=f"""
-            <!DOCTYPE html>
-            <html>
-            <head><title>Authentication Error</title></head>
-            <body style="font-family: sans-serif; padding: 40px; text-align: center;">
-                <h1>Authentication Failed</h1>
-                <p>{str(e)}</p>
-                <p>Please try connecting again.</p>
-                <p><a href="https://app.sokosumi.com">Return to Sokosumi</a></p>
-            </body>
-            </html>
-            """,
-            status_code=400,
-        )
+        logger.error("OAuth callback error: %s", e)
+        return _auth_error_page(str(e), "Please try connecting again.", status_code=400)
+    except httpx.HTTPError as e:
+        logger.warning("OAuth callback transport error: %s", e)
+        return _callback_upstream_error(request)
     except Exception as e:
-        logger.error(f"OAuth callback unexpected error: {e}")
-        return HTMLResponse(
-            content=f"""
-            <!DOCTYPE html>
-            <html>
-            <head><title>Authentication Error</title></head>
-            <body style="font-family: sans-serif; padding: 40px; text-align: center;">
-                <h1>Authentication Failed</h1>
-                <p>An unexpected error occurred. Please try again.</p>
-                <p><a href="https://app.sokosumi.com">Return to Sokosumi</a></p>
-            </body>
-            </html>
-            """,
-            status_code=500,
-        )
+        # Unexpected upstream response shapes (e.g. a non-object token or
+        # userinfo body) get the same page instead of a bare 500
+        logger.error("OAuth callback unexpected upstream response: %r", e)
+        return _callback_upstream_error(request)
+
+
+# Token requests carry a handful of short fields; anything larger is rejected.
+MAX_FORM_BODY_BYTES = 8192
+
+
+async def _read_urlencoded(request: Request) -> Optional[Dict[str, str]]:
+    """
+    Parse an application/x-www-form-urlencoded body into a dict.
+
+    Reads the raw body and parses it directly, skipping Starlette's form
+    content-type detection and multipart machinery.
+
+    Returns:
+        The parsed fields, or None if the body exceeds MAX_FORM_BODY_BYTES
+
+    Raises:
+        ValueError: If the body has more than MAX_OAUTH_FIELDS fields
+    """
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > MAX_FORM_BODY_BYTES:
+        return None
+    body = await request.body()
+    if len(body) > MAX_FORM_BODY_BYTES:
+        return None
+    return _parse_urlencoded(body.decode("utf-8", "replace"))
+
+
+# Required fields for each supported token grant
+AUTHORIZATION_CODE_GRANT_FIELDS = ("code", "code_verifier", "client_id", "redirect_uri")
+REFRESH_TOKEN_GRANT_FIELDS = ("refresh_token",)
+
+
+def _missing_fields(values: Dict[str, str], fields: Tuple[str, ...]) -> list:
+    """Return the names of required fields that are absent or empty."""
+    return [field for field in fields if not values.get(field)]
 
 
 async def oauth_token(request: Request) -> Response:
@@ -1763,55 +2234,57 @@ async def oauth_token(request: Request) -> Response:
 
     Exchanges authorization code for access token, or refreshes tokens.
     """
-    # Parse form data
-    form = await request.form()
+    # Parse form data into a plain dict once
+    try:
+        form = await _read_urlencoded(request)
+    except ValueError:
+        return _ERR_TOO_MANY_PARAMETERS
+    if form is None:
+        return _oauth_error("invalid_request", "Request body too large", status_code=413)
     grant_type = form.get("grant_type", "")
 
     if grant_type == "authorization_code":
-        code = form.get("code", "")
-        code_verifier = form.get("code_verifier", "")
-        client_id = form.get("client_id", "")
-        redirect_uri = form.get("redirect_uri", "")
-
-        if not code or not code_verifier or not client_id or not redirect_uri:
-            return JSONResponse(
-                status_code=400,
-                content={"error": "invalid_request", "error_description": "Missing required parameters"},
+        missing = _missing_fields(form, AUTHORIZATION_CODE_GRANT_FIELDS)
+        if missing:
+            return _oauth_error(
+                "invalid_request", f"Missing required parameters: {', '.join(missing)}"
             )
+        code, code_verifier, client_id, redirect_uri = (
+            form[field] for field in AUTHORIZATION_CODE_GRANT_FIELDS
+        )
 
         try:
-            tokens = exchange_code_for_tokens(code, code_verifier, client_id, redirect_uri)
-            logger.info(f"Token exchange successful for client: {client_id}")
-            return JSONResponse(tokens)
+            tokens = await exchange_code_for_tokens(code, code_verifier, client_id, redirect_uri)
+            logger.info("Token exchange successful for client: %s", client_id)
+            return ORJSONResponse(tokens)
         except ValueError as e:
-            logger.warning(f"Token exchange failed: {e}")
-            return JSONResponse(
+            logger.warning("Token exchange failed: %s", e)
+            return ORJSONResponse(
                 status_code=400,
                 content={"error": "invalid_grant", "error_description": str(e)},
             )
 
     elif grant_type == "refresh_token":
-        refresh_token = form.get("refresh_token", "")
-
-        if not refresh_token:
-            return JSONResponse(
-                status_code=400,
-                content={"error": "invalid_request", "error_description": "refresh_token is required"},
+        missing = _missing_fields(form, REFRESH_TOKEN_GRANT_FIELDS)
+        if missing:
+            return _oauth_error(
+                "invalid_request", f"Missing required parameters: {', '.join(missing)}"
             )
+        refresh_token = form["refresh_token"]
 
         try:
             tokens = await refresh_access_token(refresh_token)
             logger.info("Token refresh successful")
-            return JSONResponse(tokens)
+            return ORJSONResponse(tokens)
         except ValueError as e:
-            logger.warning(f"Token refresh failed: {e}")
-            return JSONResponse(
+            logger.warning("Token refresh failed: %s", e)
+            return ORJSONResponse(
                 status_code=400,
                 content={"error": "invalid_grant", "error_description": str(e)},
             )
 
     else:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=400,
             content={"error": "unsupported_grant_type", "error_description": "Supported: authorization_code, refresh_token"},
         )
@@ -1825,7 +2298,7 @@ if __name__ == "__main__":
 
     if port:
         # Remote deployment - use Streamable HTTP transport
-        logger.info(f"Starting MCP server on port {port}")
+        logger.info("Starting MCP server on port %s", port)
 
         try:
             # Get the ASGI app from FastMCP for Streamable HTTP
@@ -1833,59 +2306,67 @@ if __name__ == "__main__":
             app = mcp.streamable_http_app()
             logger.info("Using Streamable HTTP transport")
 
-            # Add OAuth endpoints
+            # Render the OAuth discovery documents and JWKS before serving
+            warm_static_json()
+
+            # Keep one pooled Sokosumi HTTP client open for the app lifetime
+            app.router.lifespan_context = with_http_client(app.router.lifespan_context)
+
+            # Add OAuth endpoints, grouped under two prefix mounts so requests
+            # for /mcp skip them with a single prefix check each
             oauth_routes = [
                 # Well-known endpoints
-                Route(
-                    "/.well-known/oauth-protected-resource",
-                    oauth_protected_resource_metadata,
-                    methods=["GET"],
-                ),
-                Route(
-                    "/.well-known/oauth-authorization-server",
-                    oauth_authorization_server_metadata,
-                    methods=["GET"],
+                Mount(
+                    "/.well-known",
+                    routes=[
+                        Route(
+                            "/oauth-protected-resource",
+                            oauth_protected_resource_metadata,
+                            methods=["GET"],
+                        ),
+                        Route(
+                            "/oauth-authorization-server",
+                            oauth_authorization_server_metadata,
+                            methods=["GET"],
+                        ),
+                    ],
                 ),
                 # OAuth endpoints
-                Route(
-                    "/oauth/jwks",
-                    oauth_jwks,
-                    methods=["GET"],
-                ),
-                Route(
-                    "/oauth/authorize",
-                    oauth_authorize,
-                    methods=["GET"],
-                ),
-                Route(
-                    "/oauth/callback",
-                    oauth_callback,
-                    methods=["GET"],
-                ),
-                Route(
-                    "/oauth/token",
-                    oauth_token,
-                    methods=["POST"],
+                Mount(
+                    "/oauth",
+                    routes=[
+                        Route("/jwks", oauth_jwks, methods=["GET"]),
+                        Route("/authorize", oauth_authorize, methods=["GET"]),
+                        Route("/callback", oauth_callback, methods=["GET"]),
+                        Route("/token", oauth_token, methods=["POST"]),
+                    ],
                 ),
             ]
-            for route in oauth_routes:
-                app.routes.insert(0, route)
+            app.router.routes[:0] = oauth_routes
             logger.info("Added OAuth 2.1 endpoints (delegating to Sokosumi OAuth)")
 
             # Add authentication middleware (API key or OAuth Bearer token)
             app.add_middleware(AuthenticationMiddleware)
             logger.info("Added authentication middleware (API key + OAuth)")
 
-            # Run with uvicorn
+            # Run with uvicorn. With uvicorn[standard] installed, "auto" selects
+            # the uvloop event loop and the httptools parser, falling back to
+            # asyncio/h11 where they are unavailable (e.g. Windows). This stays a
+            # single process: OAuth sessions, auth codes and refresh tokens live
+            # in process memory and would not be shared across workers.
+            # Per-request access logging is off unless ACCESS_LOG is set; the
+            # platform's edge proxy already logs requests.
             uvicorn.run(
                 app,
                 host="0.0.0.0",
                 port=int(port),
-                log_level="info",
-                access_log=True
+                loop="auto",
+                http="auto",
+                log_level=LOG_LEVEL,
+                access_log=os.environ.get("ACCESS_LOG", "").lower() in ("1", "true", "yes"),
             )
         except Exception as e:
-            logger.error(f"Failed to start server: {e}")
+            logger.error("Failed to start server: %s", e)
             sys.exit(1)
     else:
         # Local development - use stdio transport
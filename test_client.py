@@ -24,8 +24,23 @@ async def test_mcp_server():
             # Initialize the connection
             await session.initialize()
             
+            # The listing and the tool calls are independent, so issue them
+            # concurrently over the one session instead of one after another
+            tools, profile, agents, schema = await asyncio.gather(
+                session.list_tools(),
+                session.call_tool("get_user_profile", arguments={}),
+                session.call_tool("list_agents", arguments={}),
+                # This will likely fail without a real agent ID, but shows the structure
+                session.call_tool(
+                    "get_agent_input_schema", 
+                    arguments={"agent_id": "test-agent-id"}
+                ),
+                return_exceptions=True,
+            )
+            
             # List available tools
-            tools = await session.list_tools()
+            if isinstance(tools, Exception):
+                raise tools
             print("Available tools:")
             for tool in tools.tools:
                 print(f"  - {tool.name}: {tool.description}")
@@ -35,32 +50,25 @@ async def test_mcp_server():
             print("="*50)
             
             # Test 1: Get user profile
-            try:
-                print("\n1. Testing get_user_profile...")
-                result = await session.call_tool("get_user_profile", arguments={})
-                print(f"Result: {result.content[0].text}")
-            except Exception as e:
-                print(f"Error: {e}")
+            print("\n1. Testing get_user_profile...")
+            if isinstance(profile, Exception):
+                print(f"Error: {profile}")
+            else:
+                print(f"Result: {profile.content[0].text}")
             
             # Test 2: List available agents
-            try:
-                print("\n2. Testing list_agents...")
-                result = await session.call_tool("list_agents", arguments={})
-                print(f"Result: {result.content[0].text}")
-            except Exception as e:
-                print(f"Error: {e}")
+            print("\n2. Testing list_agents...")
+            if isinstance(agents, Exception):
+                print(f"Error: {agents}")
+            else:
+                print(f"Result: {agents.content[0].text}")
             
             # Test 3: Get agent input schema (using a common agent ID)
-            try:
-                print("\n3. Testing get_agent_input_schema...")
-                # This will likely fail without a real agent ID, but shows the structure
-                result = await session.call_tool(
-                    "get_agent_input_schema", 
-                    arguments={"agent_id": "test-agent-id"}
-                )
-                print(f"Result: {result.content[0].text}")
-            except Exception as e:
-                print(f"Error (expected without real agent ID): {e}")
+            print("\n3. Testing get_agent_input_schema...")
+            if isinstance(schema, Exception):
+                print(f"Error (expected without real agent ID): {schema}")
+            else:
+                print(f"Result: {schema.content[0].text}")
             
             print("\n" + "="*50)
             print("Test completed! Note: Some tests may fail without valid API key or agent IDs.")